@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 import io
+import os
+import re
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -19,12 +21,29 @@ st.set_page_config(
 # Título da aplicação
 st.title("📊 Análise Estatística - Dados 3° Séries e 9° Anos")
 
+# Função para obter a data de modificação do arquivo (chave do cache)
+def file_mtime(file_path):
+    try:
+        return os.path.getmtime(file_path)
+    except OSError:
+        return None
+
+# Função para converter colunas de texto que contêm apenas números
+def convert_numeric_columns(data):
+    """Converte para numérico as colunas de texto cujos valores são todos números (aceita vírgula decimal)"""
+    for coluna in data.select_dtypes(include='object').columns:
+        valores = data[coluna]
+        convertida = pd.to_numeric(valores.replace(',', '.', regex=True), errors='coerce')
+        if convertida.notna().sum() == valores.notna().sum():
+            data[coluna] = convertida
+    return data
+
 # Função para carregar dados
-@st.cache_data
-def load_data(file_path):
+@st.cache_data(show_spinner=False)
+def load_data(file_path, mtime=None):
     try:
-        data = pd.read_csv(file_path)
-        return data
+        data = pd.read_csv(file_path, engine='pyarrow')
+        return convert_numeric_columns(data)
     except Exception as e:
         st.error(f"Erro ao carregar o arquivo {file_path}: {e}")
         return None
@@ -54,15 +73,88 @@ def basic_statistics(data, dataset_name):
 # Função para encontrar colunas similares
 def find_similar_columns(data, keywords):
     """Encontra colunas que contenham as keywords fornecidas"""
-    found_columns = []
-    for col in data.columns:
-        col_lower = col.lower()
-        for keyword in keywords:
-            if keyword.lower() in col_lower:
-                found_columns.append(col)
-                break
+    keywords_lower = tuple(keyword.lower() for keyword in keywords)
+    return [
+        col for col, col_lower in ((col, col.lower()) for col in data.columns)
+        if any(keyword in col_lower for keyword in keywords_lower)
+    ]
+
+# Função para encontrar colunas de vários grupos de keywords em uma única varredura
+def find_column_groups(columns, keyword_groups):
+    """Encontra, para cada grupo de keywords, as colunas que contenham alguma delas"""
+    nomes = list(keyword_groups)
+    # Um lookahead opcional por grupo: uma única chamada de match por coluna
+    # informa todos os grupos encontrados
+    padrao = re.compile(''.join(
+        f"(?=.*?(?P<g{i}>{'|'.join(re.escape(keyword.lower()) for keyword in keyword_groups[nome])}))?"
+        for i, nome in enumerate(nomes)
+    ), re.DOTALL)
+
+    found_columns = {nome: [] for nome in nomes}
+    for col in columns:
+        match = padrao.match(col.lower())
+        for i, nome in enumerate(nomes):
+            if match.group(f'g{i}') is not None:
+                found_columns[nome].append(col)
     return found_columns
 
+# Função para reduzir o tipo numérico (menos bytes por valor)
+def _downcast_numeric(serie):
+    """Converte para o menor inteiro possível ou, se houver decimais, para float32"""
+    serie = pd.to_numeric(serie, downcast='integer')
+    if serie.dtype.kind == 'f':
+        serie = pd.to_numeric(serie, downcast='float')
+    return serie
+
+# Função para preparar os dados numéricos por grupo (em cache)
+@st.cache_data
+def _clean_numeric_data(data, coluna_grupo, colunas_valores):
+    """Converte as colunas de valores para numérico, remove linhas nulas e codifica o grupo como categoria"""
+    valores = {}
+    for coluna in colunas_valores:
+        if data[coluna].dtype == 'object':
+            valores[coluna] = pd.to_numeric(data[coluna], errors='coerce')
+        else:
+            valores[coluna] = data[coluna]
+
+    # Uma única máscara de linhas válidas, sem cópias intermediárias
+    mask = data[coluna_grupo].notna()
+    for serie in valores.values():
+        mask &= serie.notna()
+
+    # Grupo como categoria (groupby/isin sobre códigos inteiros), codificado uma vez por base
+    data_clean = {coluna_grupo: data[coluna_grupo][mask].astype('category')}
+    for coluna, serie in valores.items():
+        data_clean[coluna] = _downcast_numeric(serie[mask])
+
+    return pd.DataFrame(data_clean)
+
+# Função para calcular as estatísticas por escola (em cache)
+@st.cache_data
+def _compute_school_stats(data_clean, coluna_escola, coluna_total_pontos):
+    """Calcula média, mediana, mínimo, máximo, desvio padrão e quantidade por escola"""
+    grupos = data_clean.groupby(coluna_escola, sort=False, observed=True)[coluna_total_pontos]
+    return grupos.agg([
+        ('Média', 'mean'),
+        ('Mediana', 'median'),
+        ('Mínimo', 'min'),
+        ('Máximo', 'max'),
+        ('Desvio_Padrão', 'std'),
+        ('Quantidade_Alunos', 'count')
+    ]).round(2)
+
+# Função para listar as escolas disponíveis no filtro (em cache)
+@st.cache_data
+def _school_options(estatisticas_escolas):
+    """Lista as escolas na ordem das estatísticas (maior média primeiro)"""
+    return estatisticas_escolas.index.tolist()
+
+# Função para gerar o CSV de exportação (em cache)
+@st.cache_data
+def _df_to_csv(df):
+    """Converte o DataFrame em bytes CSV (UTF-8) para download"""
+    return df.to_csv(index=False).encode('utf-8')
+
 # Função para análise estatística por escola
 def school_statistics(data, dataset_name):
     st.header(f"🏫 Estatísticas por Escola - {dataset_name}")
@@ -71,8 +163,15 @@ def school_statistics(data, dataset_name):
     with st.expander("🔍 Ver todas as colunas disponíveis"):
         st.write(f"Total de colunas: {len(data.columns)}")
         st.write("Lista de colunas:")
-        for i, col in enumerate(data.columns):
-            st.write(f"{i+1}. {col} (tipo: {data[col].dtype})")
+        st.dataframe(
+            pd.DataFrame({
+                '#': np.arange(1, len(data.columns) + 1),
+                'coluna': data.columns,
+                'tipo': data.dtypes.astype(str).values
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
     
     # Encontrar colunas similares
     st.subheader("🎯 Seleção de Colunas para Análise")
@@ -114,20 +213,13 @@ def school_statistics(data, dataset_name):
     
     # Preparar os dados
     with st.status("🔄 Preparando dados para análise...", expanded=True) as status:
-        # Criar cópia dos dados relevantes
-        data_analysis = data[[coluna_escola, coluna_total_pontos]].copy()
-        
         # Converter coluna de pontos para numérico se necessário
-        if data_analysis[coluna_total_pontos].dtype == 'object':
+        if data[coluna_total_pontos].dtype == 'object':
             st.write("Convertendo coluna de pontos para numérico...")
-            data_analysis[coluna_total_pontos] = pd.to_numeric(
-                data_analysis[coluna_total_pontos], 
-                errors='coerce'
-            )
-        
-        # Remover linhas com valores nulos
-        initial_count = len(data_analysis)
-        data_clean = data_analysis.dropna()
+
+        # Remover linhas com valores nulos (só as colunas usadas entram no hash do cache)
+        initial_count = len(data)
+        data_clean = _clean_numeric_data(data[[coluna_escola, coluna_total_pontos]], coluna_escola, (coluna_total_pontos,))
         final_count = len(data_clean)
         
         st.write(f"Registros antes da limpeza: {initial_count}")
@@ -150,14 +242,11 @@ def school_statistics(data, dataset_name):
     
     # Calcular estatísticas por escola
     try:
-        estatisticas_escolas = data_clean.groupby(coluna_escola)[coluna_total_pontos].agg([
-            ('Média', 'mean'),
-            ('Mediana', 'median'),
-            ('Mínimo', 'min'),
-            ('Máximo', 'max'),
-            ('Desvio_Padrão', 'std'),
-            ('Quantidade_Alunos', 'count')
-        ]).round(2)
+        estatisticas_escolas = _compute_school_stats(data_clean, coluna_escola, coluna_total_pontos)
+        
+        # Estatísticas gerais dos pontos (calculadas uma única vez)
+        resumo_pontos = data_clean[coluna_total_pontos].agg(['mean', 'median', 'std', 'min', 'max'])
+        media_geral = resumo_pontos['mean']
         
         # Ordenar por média (opcional)
         estatisticas_escolas = estatisticas_escolas.sort_values('Média', ascending=False)
@@ -180,21 +269,27 @@ def school_statistics(data, dataset_name):
             )
         
         with col2:
+            opcoes_escolas = _school_options(estatisticas_escolas)
             escolas_filtradas = st.multiselect(
                 "Selecionar escolas específicas",
-                options=estatisticas_escolas_reset[coluna_escola].tolist(),
-                default=estatisticas_escolas_reset[coluna_escola].head(10).tolist(),
+                options=opcoes_escolas,
+                default=opcoes_escolas[:10],
                 key=f"escolas_select_{dataset_name}"
             )
         
         # Aplicar filtros
-        estatisticas_filtradas = estatisticas_escolas_reset[
-            (estatisticas_escolas_reset['Quantidade_Alunos'] >= min_alunos) &
-            (estatisticas_escolas_reset[coluna_escola].isin(escolas_filtradas) if escolas_filtradas else True)
-        ]
+        escolas_selecionadas = frozenset(escolas_filtradas) if escolas_filtradas else None
+        filtro = estatisticas_escolas_reset['Quantidade_Alunos'] >= min_alunos
+        if escolas_selecionadas:
+            filtro &= estatisticas_escolas_reset[coluna_escola].isin(escolas_selecionadas)
+        estatisticas_filtradas = estatisticas_escolas_reset[filtro]
         
         st.dataframe(estatisticas_filtradas, use_container_width=True)
         
+        # Versões ordenadas usadas pelos gráficos (calculadas uma única vez)
+        estatisticas_por_media = estatisticas_filtradas.sort_values('Média', ascending=True)
+        estatisticas_por_quantidade = estatisticas_filtradas.sort_values('Quantidade_Alunos', ascending=True)
+        
         # Gráficos interativos
         st.subheader("📊 Visualizações Interativas")
         
@@ -204,7 +299,7 @@ def school_statistics(data, dataset_name):
         with tab1:
             # Gráfico de médias por escola - INTERATIVO
             fig_medias = px.bar(
-                estatisticas_filtradas.sort_values('Média', ascending=True),
+                estatisticas_por_media,
                 x='Média',
                 y=coluna_escola,
                 orientation='h',
@@ -227,7 +322,6 @@ def school_statistics(data, dataset_name):
             )
             
             # Adicionar linha da média geral
-            media_geral = data_clean[coluna_total_pontos].mean()
             fig_medias.add_vline(
                 x=media_geral, 
                 line_dash="dash", 
@@ -240,7 +334,7 @@ def school_statistics(data, dataset_name):
         with tab2:
             # Gráfico de quantidade de alunos por escola - INTERATIVO
             fig_alunos = px.bar(
-                estatisticas_filtradas.sort_values('Quantidade_Alunos', ascending=True),
+                estatisticas_por_quantidade,
                 x='Quantidade_Alunos',
                 y=coluna_escola,
                 orientation='h',
@@ -273,7 +367,8 @@ def school_statistics(data, dataset_name):
                 color='Média',
                 hover_name=coluna_escola,
                 title=f'📈 Relação entre Quantidade de Alunos e Média de Pontos - {dataset_name}',
-                size_max=60,
+                size_max=40,
+                render_mode='webgl',
                 color_continuous_scale='rainbow',
                 hover_data={
                     'Mediana': ':.2f',
@@ -302,8 +397,16 @@ def school_statistics(data, dataset_name):
         with tab4:
             # Box plot interativo da distribuição por escola
             # Selecionar top escolas para o box plot (para não sobrecarregar o gráfico)
-            top_escolas = estatisticas_filtradas.nlargest(15, 'Quantidade_Alunos')[coluna_escola].tolist()
-            data_top_escolas = data_clean[data_clean[coluna_escola].isin(top_escolas)]
+            top_escolas = frozenset(estatisticas_por_quantidade[coluna_escola].tail(15))
+            data_top_escolas = data_clean.loc[data_clean[coluna_escola].isin(top_escolas)]
+            # Manter apenas as categorias presentes (evita grupos vazios no gráfico)
+            data_top_escolas = data_top_escolas.assign(**{
+                coluna_escola: data_top_escolas[coluna_escola].cat.remove_unused_categories()
+            })
+            
+            # Limitar a quantidade de pontos enviados ao navegador
+            if len(data_top_escolas) > 5000:
+                data_top_escolas = data_top_escolas.sample(5000, random_state=0)
             
             fig_box = px.box(
                 data_top_escolas,
@@ -311,7 +414,7 @@ def school_statistics(data, dataset_name):
                 y=coluna_total_pontos,
                 title=f'🎯 Distribuição de Pontos por Escola (Top 15 por quantidade de alunos) - {dataset_name}',
                 color=coluna_escola,
-                points="all"
+                points="outliers"
             )
             
             fig_box.update_layout(
@@ -336,7 +439,7 @@ def school_statistics(data, dataset_name):
                 estatisticas_escolas.shape[0],
                 f"{estatisticas_filtradas.shape[0]} filtradas"
             )
-            st.metric("Média Geral", f"{data_clean[coluna_total_pontos].mean():.2f}")
+            st.metric("Média Geral", f"{media_geral:.2f}")
         
         with col2:
             st.metric(
@@ -344,19 +447,19 @@ def school_statistics(data, dataset_name):
                 estatisticas_escolas['Quantidade_Alunos'].sum(),
                 f"{estatisticas_filtradas['Quantidade_Alunos'].sum()} filtrados"
             )
-            st.metric("Mediana Geral", f"{data_clean[coluna_total_pontos].median():.2f}")
+            st.metric("Mediana Geral", f"{resumo_pontos['median']:.2f}")
         
         with col3:
             st.metric("Maior Média", f"{estatisticas_escolas['Média'].max():.2f}")
             st.metric("Menor Média", f"{estatisticas_escolas['Média'].min():.2f}")
         
         with col4:
-            st.metric("Desvio Padrão Geral", f"{data_clean[coluna_total_pontos].std():.2f}")
-            st.metric("Amplitude Total", f"{data_clean[coluna_total_pontos].max() - data_clean[coluna_total_pontos].min():.2f}")
+            st.metric("Desvio Padrão Geral", f"{resumo_pontos['std']:.2f}")
+            st.metric("Amplitude Total", f"{float(resumo_pontos['max']) - float(resumo_pontos['min']):.2f}")
         
         # Download dos dados processados
         st.subheader("💾 Exportar Dados")
-        csv = estatisticas_escolas_reset.to_csv(index=False)
+        csv = _df_to_csv(estatisticas_escolas_reset)
         st.download_button(
             label="📥 Baixar estatísticas por escola em CSV",
             data=csv,
@@ -368,10 +471,22 @@ def school_statistics(data, dataset_name):
         st.error(f"❌ Erro ao calcular estatísticas: {e}")
         st.info("Isso pode ocorrer se não houver dados numéricos suficientes para análise.")
 
+# Função para montar a agregação nomeada (média, desvio e contagem) de cada coluna
+def _agregacoes_nomeadas(colunas):
+    """Retorna {coluna_estatistica: (coluna, estatistica)} na ordem das colunas"""
+    return {
+        f'{coluna}_{estatistica}': (coluna, estatistica)
+        for coluna in colunas
+        for estatistica in ('mean', 'std', 'count')
+    }
+
 # Função para análise detalhada das colunas
 def column_analysis(data, dataset_name):
     st.header(f"🔍 Análise por Coluna - {dataset_name}")
     
+    # Estatísticas que serão oferecidas para download
+    dados_exportar = None
+    
     # Seleção múltipla de colunas
     st.subheader("🎯 Seleção de Colunas para Análise")
     
@@ -380,9 +495,14 @@ def column_analysis(data, dataset_name):
     nota_lp_keywords = ['nota lp', 'nota_lp', 'portugues', 'português', 'lingua portuguesa']
     nota_mat_keywords = ['nota mat', 'nota_mat', 'matemática', 'matematica', 'math']
     
-    colunas_escola = find_similar_columns(data, escola_keywords)
-    colunas_nota_lp = find_similar_columns(data, nota_lp_keywords)
-    colunas_nota_mat = find_similar_columns(data, nota_mat_keywords)
+    colunas_encontradas = find_column_groups(data.columns, {
+        'escola': escola_keywords,
+        'nota_lp': nota_lp_keywords,
+        'nota_mat': nota_mat_keywords
+    })
+    colunas_escola = colunas_encontradas['escola']
+    colunas_nota_lp = colunas_encontradas['nota_lp']
+    colunas_nota_mat = colunas_encontradas['nota_mat']
     
     # Seleção de colunas
     col1, col2 = st.columns(2)
@@ -416,28 +536,28 @@ def column_analysis(data, dataset_name):
     if tem_escola and (tem_nota_lp or tem_nota_mat):
         st.subheader("🏫 Análise de Notas por Escola")
         
-        # Preparar dados
-        colunas_analise_selecionadas = [coluna_agrupamento] + colunas_analise
-        data_analysis = data[colunas_analise_selecionadas].copy()
-        
-        # Converter colunas numéricas
-        for col in colunas_analise:
-            if data_analysis[col].dtype == 'object':
-                data_analysis[col] = pd.to_numeric(data_analysis[col], errors='coerce')
-        
-        # Remover valores nulos
-        data_clean = data_analysis.dropna()
+        # Preparar dados: converter colunas numéricas e remover valores nulos
+        # (só as colunas usadas entram no hash do cache)
+        data_clean = _clean_numeric_data(data[[coluna_agrupamento, *colunas_analise]], coluna_agrupamento, tuple(colunas_analise))
         
         if len(data_clean) == 0:
             st.error("❌ Não há dados válidos para análise após a limpeza.")
             return
         
-        # Calcular estatísticas agrupadas
-        estatisticas_escolas = data_clean.groupby(coluna_agrupamento)[colunas_analise].agg(['mean', 'std', 'count']).round(2)
+        # Estatísticas gerais por disciplina (calculadas uma única vez)
+        resumo_disciplinas = data_clean[colunas_analise].agg(
+            ['mean', 'median', 'std', 'var', 'min', 'max', 'skew', 'kurt']
+        )
+        media_geral = resumo_disciplinas.loc['mean'].mean()
         
-        # Renomear colunas para melhor visualização
-        estatisticas_escolas.columns = ['_'.join(col).strip() for col in estatisticas_escolas.columns.values]
-        estatisticas_escolas = estatisticas_escolas.reset_index()
+        # Calcular estatísticas agrupadas (agregação nomeada: colunas já saem com o nome final)
+        estatisticas_brutas = (
+            data_clean.groupby(coluna_agrupamento, observed=True)
+            .agg(**_agregacoes_nomeadas(colunas_analise))
+            .reset_index()
+        )
+        estatisticas_escolas = estatisticas_brutas.round(2)
+        dados_exportar = estatisticas_escolas
         
         # Criar descrição personalizada baseada nas colunas selecionadas
         descricao_analise = ""
@@ -457,35 +577,30 @@ def column_analysis(data, dataset_name):
         # Gráficos interativos
         st.subheader("📈 Visualizações")
         
-        # Preparar dados para gráficos
-        dados_melted = data_clean.melt(
-            id_vars=[coluna_agrupamento],
-            value_vars=colunas_analise,
-            var_name='Disciplina',
-            value_name='Nota'
-        )
+        # Preparar dados para gráficos: médias por escola no formato largo,
+        # reaproveitando as médias já calculadas (sem arredondamento)
+        medias_por_escola = estatisticas_brutas[
+            [coluna_agrupamento] + [f'{col}_mean' for col in colunas_analise]
+        ].set_axis([coluna_agrupamento] + colunas_analise, axis=1)
+        
+        # ORDENAÇÃO CORRIGIDA: Maior média em cima, menor em baixo
+        medias_gerais = medias_por_escola[colunas_analise].mean(axis=1).to_numpy()
+        ordem_idx = np.argsort(-medias_gerais, kind='stable')
+        ordem_escolas = medias_por_escola[coluna_agrupamento].to_numpy()[ordem_idx].tolist()
+        medias_ordenadas = medias_gerais[ordem_idx]
         
         # Criar tabs para diferentes visualizações
         tab1, tab2, tab3, tab4 = st.tabs(["🏆 Ranking de Médias", "📈 Comparação Horizontal", "🎯 Distribuição", "📋 Estatísticas"])
         
         with tab1:
             # GRÁFICO HIERÁRQUICO - Escolas no eixo Y, médias no eixo X
-            medias_por_escola = dados_melted.groupby([coluna_agrupamento, 'Disciplina'])['Nota'].mean().reset_index()
-            
-            # ORDENAÇÃO CORRIGIDA: Maior média em cima, menor em baixo
-            ordem_escolas = medias_por_escola.groupby(coluna_agrupamento)['Nota'].mean().sort_values(ascending=False).index
-            
             fig_hierarquico = px.bar(
-                medias_por_escola,
-                x='Nota',
+                medias_por_escola.round(2),
+                x=colunas_analise,  # Uma série por disciplina (formato largo)
                 y=coluna_agrupamento,
-                color='Disciplina',
                 orientation='h',  # Barras horizontais
                 title=f'🏆 Ranking de Médias por Escola - {dataset_name}',
-                hover_data={
-                    'Nota': ':.2f',
-                    coluna_agrupamento: True
-                },
+                labels={'value': 'Nota', 'variable': 'Disciplina'},
                 category_orders={coluna_agrupamento: ordem_escolas}  # Ordenar escolas (maior → menor)
             )
             
@@ -504,7 +619,6 @@ def column_analysis(data, dataset_name):
             )
             
             # Adicionar linha da média geral
-            media_geral = data_clean[colunas_analise].mean().mean()
             fig_hierarquico.add_vline(
                 x=media_geral, 
                 line_dash="dash", 
@@ -524,32 +638,22 @@ def column_analysis(data, dataset_name):
             
             with col1:
                 st.write("**🥇 Top 3 Melhores Escolas:**")
-                top_3 = ordem_escolas[:3]
-                for i, escola in enumerate(top_3, 1):
+                top_3 = zip(ordem_escolas[:3], medias_ordenadas[:3])
+                for i, (escola, media_geral_escola) in enumerate(top_3, 1):
                     medal = ["🥇", "🥈", "🥉"][i-1]
-                    media_geral_escola = medias_por_escola.groupby(coluna_agrupamento)['Nota'].mean().loc[escola]
                     st.write(f"{medal} **{escola}:** {media_geral_escola:.2f}")
             
             with col2:
                 st.write("**📉 3 Escolas com Menor Desempenho:**")
-                bottom_3 = ordem_escolas[-3:]
-                for i, escola in enumerate(reversed(bottom_3), 1):
-                    media_geral_escola = medias_por_escola.groupby(coluna_agrupamento)['Nota'].mean().loc[escola]
+                bottom_3 = zip(ordem_escolas[::-1][:3], medias_ordenadas[::-1][:3])
+                for i, (escola, media_geral_escola) in enumerate(bottom_3, 1):
                     st.write(f"📉 **{escola}:** {media_geral_escola:.2f}")
         
         with tab2:
             # Gráfico de comparação horizontal entre disciplinas
             if len(colunas_analise) > 1:
-                # Pivot table para ter disciplinas como colunas
-                pivot_medias = medias_por_escola.pivot(
-                    index=coluna_agrupamento, 
-                    columns='Disciplina', 
-                    values='Nota'
-                ).reset_index()
-                
-                # Ordenar pela média geral (MAIOR → MENOR)
-                pivot_medias['Média_Geral'] = pivot_medias[colunas_analise].mean(axis=1)
-                pivot_medias = pivot_medias.sort_values('Média_Geral', ascending=False)
+                # Médias com disciplinas como colunas, ordenadas pela média geral (MAIOR → MENOR)
+                pivot_medias = medias_por_escola.iloc[ordem_idx]
                 
                 fig_comparacao = go.Figure()
                 
@@ -580,6 +684,13 @@ def column_analysis(data, dataset_name):
         
         with tab3:
             # Box plot da distribuição por disciplina
+            dados_melted = data_clean.melt(
+                id_vars=[coluna_agrupamento],
+                value_vars=colunas_analise,
+                var_name='Disciplina',
+                value_name='Nota'
+            )
+            
             fig_box = px.box(
                 dados_melted,
                 x='Nota',
@@ -587,7 +698,7 @@ def column_analysis(data, dataset_name):
                 color='Disciplina',
                 orientation='h',  # Horizontal
                 title=f'🎯 Distribuição de Notas por Disciplina - {dataset_name}',
-                points="all"
+                points="outliers"
             )
             
             fig_box.update_layout(
@@ -601,8 +712,12 @@ def column_analysis(data, dataset_name):
             
             # Box plot por escola (apenas para top escolas) - ORDENADO MAIOR → MENOR
             st.subheader("📦 Distribuição por Escola (Top 15)")
-            top_escolas = data_clean[coluna_agrupamento].value_counts().head(15).index
-            data_top_escolas = data_clean[data_clean[coluna_agrupamento].isin(top_escolas)]
+            # Reaproveitar a contagem já calculada nas estatísticas agrupadas
+            top_escolas = frozenset(
+                estatisticas_escolas.nlargest(15, f'{colunas_analise[0]}_count')[coluna_agrupamento]
+            )
+            idx_top_escolas = np.flatnonzero(data_clean[coluna_agrupamento].isin(top_escolas).to_numpy())
+            data_top_escolas = data_clean.iloc[idx_top_escolas]
             
             if len(data_top_escolas) > 0:
                 dados_top_melted = data_top_escolas.melt(
@@ -612,8 +727,8 @@ def column_analysis(data, dataset_name):
                     value_name='Nota'
                 )
                 
-                # Ordenar escolas pela média (MAIOR → MENOR)
-                ordem_top_escolas = dados_top_melted.groupby(coluna_agrupamento)['Nota'].mean().sort_values(ascending=False).index
+                # Ordenar escolas pela média (MAIOR → MENOR), reaproveitando o ranking geral
+                ordem_top_escolas = [escola for escola in ordem_escolas if escola in top_escolas]
                 
                 fig_box_escolas = px.box(
                     dados_top_melted,
@@ -637,29 +752,31 @@ def column_analysis(data, dataset_name):
             # Estatísticas resumidas por disciplina
             st.subheader("📋 Estatísticas Detalhadas por Disciplina")
             
+            medias_escolas = medias_por_escola.set_index(coluna_agrupamento)
+            
             for disciplina in colunas_analise:
                 with st.expander(f"📚 {disciplina}", expanded=False):
                     col1, col2, col3, col4 = st.columns(4)
                     
                     with col1:
-                        st.metric("Média Geral", f"{data_clean[disciplina].mean():.2f}")
-                        st.metric("Mediana", f"{data_clean[disciplina].median():.2f}")
+                        st.metric("Média Geral", f"{resumo_disciplinas.loc['mean', disciplina]:.2f}")
+                        st.metric("Mediana", f"{resumo_disciplinas.loc['median', disciplina]:.2f}")
                     
                     with col2:
-                        st.metric("Desvio Padrão", f"{data_clean[disciplina].std():.2f}")
-                        st.metric("Variância", f"{data_clean[disciplina].var():.2f}")
+                        st.metric("Desvio Padrão", f"{resumo_disciplinas.loc['std', disciplina]:.2f}")
+                        st.metric("Variância", f"{resumo_disciplinas.loc['var', disciplina]:.2f}")
                     
                     with col3:
-                        st.metric("Mínimo", f"{data_clean[disciplina].min():.2f}")
-                        st.metric("Máximo", f"{data_clean[disciplina].max():.2f}")
+                        st.metric("Mínimo", f"{resumo_disciplinas.loc['min', disciplina]:.2f}")
+                        st.metric("Máximo", f"{resumo_disciplinas.loc['max', disciplina]:.2f}")
                     
                     with col4:
-                        st.metric("Assimetria", f"{data_clean[disciplina].skew():.2f}")
-                        st.metric("Curtose", f"{data_clean[disciplina].kurtosis():.2f}")
+                        st.metric("Assimetria", f"{resumo_disciplinas.loc['skew', disciplina]:.2f}")
+                        st.metric("Curtose", f"{resumo_disciplinas.loc['kurt', disciplina]:.2f}")
                     
                     # Top 5 escolas nessa disciplina (MAIOR → MENOR)
                     st.subheader(f"🏅 Top 5 Escolas - {disciplina}")
-                    top_escolas_disciplina = data_clean.groupby(coluna_agrupamento)[disciplina].mean().nlargest(5).round(2)
+                    top_escolas_disciplina = medias_escolas[disciplina].nlargest(5).round(2)
                     for i, (escola, media) in enumerate(top_escolas_disciplina.items(), 1):
                         medal = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"][i-1]
                         st.write(f"{medal} **{escola}:** {media}")
@@ -668,26 +785,22 @@ def column_analysis(data, dataset_name):
         # Análise genérica para outras combinações de colunas (mantida igual)
         st.subheader("📈 Análise Estatística Geral")
         
-        # Preparar dados
-        colunas_analise_selecionadas = [coluna_agrupamento] + colunas_analise
-        data_analysis = data[colunas_analise_selecionadas].copy()
-        
-        # Converter colunas numéricas
-        for col in colunas_analise:
-            if data_analysis[col].dtype == 'object':
-                data_analysis[col] = pd.to_numeric(data_analysis[col], errors='coerce')
-        
-        # Remover valores nulos
-        data_clean = data_analysis.dropna()
+        # Preparar dados: converter colunas numéricas e remover valores nulos
+        # (só as colunas usadas entram no hash do cache)
+        data_clean = _clean_numeric_data(data[[coluna_agrupamento, *colunas_analise]], coluna_agrupamento, tuple(colunas_analise))
         
         if len(data_clean) == 0:
             st.error("❌ Não há dados válidos para análise após a limpeza.")
             return
         
         # Estatísticas agrupadas
-        estatisticas_agrupadas = data_clean.groupby(coluna_agrupamento)[colunas_analise].agg(['mean', 'std', 'count']).round(2)
-        estatisticas_agrupadas.columns = ['_'.join(col).strip() for col in estatisticas_agrupadas.columns.values]
-        estatisticas_agrupadas = estatisticas_agrupadas.reset_index()
+        estatisticas_agrupadas = (
+            data_clean.groupby(coluna_agrupamento, observed=True)
+            .agg(**_agregacoes_nomeadas(colunas_analise))
+            .round(2)
+            .reset_index()
+        )
+        dados_exportar = estatisticas_agrupadas
         
         st.subheader("📊 Estatísticas Agrupadas")
         st.dataframe(estatisticas_agrupadas, use_container_width=True)
@@ -708,10 +821,10 @@ def column_analysis(data, dataset_name):
             
             with tab1:
                 # Gráfico hierárquico para análise genérica
-                medias_agrupadas = dados_melted.groupby([coluna_agrupamento, 'Variável'])['Valor'].mean().reset_index()
+                medias_agrupadas = dados_melted.groupby([coluna_agrupamento, 'Variável'], sort=False, observed=True)['Valor'].mean().reset_index()
                 
                 # Ordenar pela média geral (MAIOR → MENOR)
-                ordem_categorias = medias_agrupadas.groupby(coluna_agrupamento)['Valor'].mean().sort_values(ascending=False).index
+                ordem_categorias = medias_agrupadas.groupby(coluna_agrupamento, sort=False, observed=True)['Valor'].mean().sort_values(ascending=False).index
                 
                 fig_hierarquico = px.bar(
                     medias_agrupadas,
@@ -741,7 +854,7 @@ def column_analysis(data, dataset_name):
                     color='Variável',
                     orientation='h',
                     title=f'Distribuição por Variável - {dataset_name}',
-                    points="all"
+                    points="outliers"
                 )
                 
                 fig_box.update_layout(
@@ -755,9 +868,8 @@ def column_analysis(data, dataset_name):
     # Download dos dados processados
     st.subheader("💾 Exportar Resultados")
     
-    if 'estatisticas_escolas' in locals() or 'estatisticas_agrupadas' in locals():
-        dados_exportar = estatisticas_escolas if 'estatisticas_escolas' in locals() else estatisticas_agrupadas
-        csv = dados_exportar.to_csv(index=False)
+    if dados_exportar is not None:
+        csv = _df_to_csv(dados_exportar)
         
         st.download_button(
             label="📥 Baixar estatísticas em CSV",
@@ -767,6 +879,234 @@ def column_analysis(data, dataset_name):
         )
 
 
+# Keywords usadas para identificar as colunas da análise de correlação
+_CORRELACAO_KEYWORDS = {
+    'escola': ['escola', 'school', 'colégio', 'colegio', 'instituição', 'unidade', 'qual a sua escola'],
+    'total': ['total', 'pontos', 'points', 'score', 'nota total', 'total de pontos'],
+    'lp': ['nota lp', 'nota_lp', 'portugues', 'português', 'lingua portuguesa', 'lp', 'língua portuguesa'],
+    'mat': ['nota mat', 'nota_mat', 'matemática', 'matematica', 'math', 'mat']
+}
+
+# Função para identificar as colunas da análise de correlação (em cache)
+@st.cache_data(show_spinner=False)
+def _identify_columns(colunas):
+    """Retorna as colunas encontradas para escola, total de pontos, nota LP e nota MAT"""
+    return find_column_groups(colunas, _CORRELACAO_KEYWORDS)
+
+# Configuração dos gráficos Plotly da análise de correlação (sem barra de ferramentas)
+_PLOTLY_CONFIG = {'displayModeBar': False}
+
+# Função para converter as colunas de desempenho para numérico (em cache)
+@st.cache_data(show_spinner=False)
+def _coerce_numeric(df, colunas):
+    """Retorna uma cópia com as colunas convertidas para float32 (valores inválidos viram NaN)"""
+    df = df.copy()
+    # float32 basta para as notas e reduz pela metade a memória percorrida nas agregações
+    for coluna in colunas:
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype(np.float32)
+    return df
+
+# Limites das classes de tamanho de escola (intervalos fechados à direita)
+_TAMANHO_BINS = np.array([50, 100, 200])
+_TAMANHO_LABELS = np.array(['Pequena (≤50)', 'Média (51-100)', 'Grande (101-200)', 'Muito Grande (>200)'])
+
+# Função para calcular médias, quantidade de alunos e correlações por escola (em cache)
+@st.cache_data(show_spinner=False)
+def _school_aggregates(data_clean, coluna_escola, colunas_desempenho):
+    """Agrupa por escola e calcula a matriz de correlação entre médias e quantidade de alunos"""
+    # Agregação nomeada: média de cada métrica e contagem de alunos
+    agregacoes = {f'Media_{coluna}': (coluna, 'mean') for coluna in colunas_desempenho}
+    agregacoes['Quantidade_Alunos'] = (colunas_desempenho[0], 'count')
+    
+    # Médias voltam para float64 (uma linha por escola) para exibição sem ruído de float32
+    tipos = {f'Media_{coluna}': np.float64 for coluna in colunas_desempenho}
+    tipos['Quantidade_Alunos'] = np.int32
+    
+    # Agrupar por escola (como categoria: códigos inteiros em vez de strings)
+    medias_por_escola = (
+        data_clean.astype({coluna_escola: 'category'})
+        .groupby(coluna_escola, sort=False, observed=True)
+        .agg(**agregacoes)
+        .astype(tipos)
+        .reset_index()
+        .rename(columns={coluna_escola: 'Escola'})
+    )
+    
+    # Matriz de correlação entre quantidade de alunos e médias
+    colunas_correlacao = ['Quantidade_Alunos'] + [f'Media_{coluna}' for coluna in colunas_desempenho]
+    corr_matrix = medias_por_escola[colunas_correlacao].corr().round(3)
+    
+    return medias_por_escola, corr_matrix
+
+# Função para exibir os gráficos e a análise por tamanho de uma métrica
+def _render_metric(nome_metrica, coluna_media, dados_grafico, stats_por_tamanho, correlacao, interpretacao, tendencia):
+    """Exibe os dois gráficos de dispersão e a tabela por tamanho de escola de uma métrica"""
+    st.write(f"#### 📈 {nome_metrica}")
+    
+    # Criar duas colunas para os gráficos
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # GRÁFICO 1: Com diferenciação por tamanho
+        fig_tamanho = px.scatter(
+            dados_grafico,
+            x='Quantidade_Alunos',
+            y=coluna_media,
+            size='Quantidade_Alunos',
+            color='Tamanho_Escola',
+            size_max=25,
+            title=f'<b>Por Tamanho da Escola</b><br><sub>Correlação: r = {correlacao:.3f}</sub>',
+            hover_data=['Escola'],
+            hover_name='Escola',
+            labels={
+                'Quantidade_Alunos': 'Quantidade de Alunos',
+                coluna_media: f'Média de {nome_metrica}',
+                'Tamanho_Escola': 'Tamanho da Escola',
+                'size': 'Quantidade de Alunos'
+            },
+            color_discrete_sequence=px.colors.qualitative.Bold
+        )
+        
+        fig_tamanho.update_layout(
+            height=500,
+            showlegend=True,
+            xaxis_title="Quantidade de Alunos",
+            yaxis_title=f"Média de {nome_metrica}",
+            font=dict(size=11)
+        )
+        
+        fig_tamanho.update_traces(
+            marker=dict(opacity=0.7, line=dict(width=1, color='darkgray'))
+        )
+        
+        if tendencia is not None:
+            fig_tamanho.add_scatter(**tendencia)
+        
+        st.plotly_chart(fig_tamanho, use_container_width=True, config=_PLOTLY_CONFIG)
+    
+    with col2:
+        # GRÁFICO 2: Todos os pontos uniformes (análise limpa)
+        fig_uniforme = px.scatter(
+            dados_grafico,
+            x='Quantidade_Alunos',
+            y=coluna_media,
+            title=f'<b>Visão Geral</b><br><sub>Correlação: r = {correlacao:.3f}</sub>',
+            hover_data=['Escola', 'Tamanho_Escola'],
+            hover_name='Escola',
+            labels={
+                'Quantidade_Alunos': 'Quantidade de Alunos',
+                coluna_media: f'Média de {nome_metrica}'
+            },
+            color_discrete_sequence=['#1f77b4']  # Azul padrão
+        )
+        
+        fig_uniforme.update_layout(
+            height=500,
+            showlegend=False,
+            xaxis_title="Quantidade de Alunos",
+            yaxis_title=f"Média de {nome_metrica}",
+            font=dict(size=11)
+        )
+        
+        fig_uniforme.update_traces(
+            marker=dict(
+                size=8, 
+                opacity=0.7, 
+                line=dict(width=1, color='darkgray')
+            )
+        )
+        
+        if tendencia is not None:
+            fig_uniforme.add_scatter(**tendencia)
+        
+        st.plotly_chart(fig_uniforme, use_container_width=True, config=_PLOTLY_CONFIG)
+    
+    # Análise detalhada por tamanho de escola (abaixo dos gráficos)
+    st.write(f"**📋 Análise Detalhada de {nome_metrica} por Tamanho de Escola:**")
+    
+    # Mostrar tabela e métricas lado a lado
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.dataframe(stats_por_tamanho, use_container_width=True)
+    
+    with col2:
+        st.metric(
+            "Correlação Geral",
+            f"{correlacao:.3f}",
+            interpretacao
+        )
+        
+        # Encontrar melhor desempenho por tamanho
+        if not stats_por_tamanho.empty:
+            melhor_tamanho = stats_por_tamanho.iloc[stats_por_tamanho['Média'].to_numpy().argmax()]
+            st.metric(
+                "Melhor Desempenho",
+                f"{melhor_tamanho['Tamanho_Escola']}",
+                f"Média: {melhor_tamanho['Média']}"
+            )
+    
+    st.write("---")
+
+# Função para exibir a visão comparativa das correlações
+def _render_summary(resumo_df, correlacoes_positivas, correlacoes_negativas):
+    """Exibe o gráfico comparativo e o resumo estatístico das correlações"""
+    st.subheader("📈 Visão Comparativa das Correlações")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Gráfico de barras comparativo
+        fig_comparativo = px.bar(
+            resumo_df,
+            x='Métrica',
+            y='Correlação (r)',
+            color='Correlação (r)',
+            color_continuous_scale='RdBu_r',
+            title='Comparação das Correlações',
+            text='Correlação (r)',
+            hover_data=['Interpretação']
+        )
+        
+        fig_comparativo.update_layout(
+            xaxis_title='Métrica de Desempenho',
+            yaxis_title='Coeficiente de Correlação (r)',
+            height=400
+        )
+        
+        fig_comparativo.update_traces(
+            texttemplate='%{text:.3f}', 
+            textposition='outside'
+        )
+        
+        st.plotly_chart(fig_comparativo, use_container_width=True, config=_PLOTLY_CONFIG)
+    
+    with col2:
+        # Resumo estatístico
+        st.write("**📊 Resumo Estatístico**")
+        
+        if not resumo_df.empty:
+            # Análise geral
+            st.metric("Correlações Positivas", correlacoes_positivas)
+            st.metric("Correlações Negativas", correlacoes_negativas)
+            
+            maior_corr = resumo_df.iloc[int(np.abs(resumo_df['Correlação (r)'].to_numpy()).argmax())]
+            st.metric(
+                "Maior Correlação (abs)", 
+                f"{maior_corr['Correlação (r)']:.3f}",
+                f"{maior_corr['Métrica']}"
+            )
+            
+            # Distribuição por força
+            st.write("**Força das Correlações:**")
+            contagem_forcas = (
+                resumo_df['Força'].value_counts()
+                .reindex(['Forte', 'Moderada', 'Fraca', 'Muito Fraca'])
+                .dropna()
+                .astype(int)
+            )
+            st.table(contagem_forcas.rename('Métricas').rename_axis('Força').to_frame())
+
 # Função para análise de correlação
 def correlation_analysis(data, dataset_name):
     st.header(f"🔗 Análise de Correlação: Médias vs Quantidade de Alunos - {dataset_name}")
@@ -774,17 +1114,12 @@ def correlation_analysis(data, dataset_name):
     # Encontrar colunas automaticamente
     st.subheader("🎯 Identificação das Colunas")
     
-    # Procurar por colunas similares
-    escola_keywords = ['escola', 'school', 'colégio', 'colegio', 'instituição', 'unidade', 'qual a sua escola']
-    total_pontos_keywords = ['total', 'pontos', 'points', 'score', 'nota total', 'total de pontos']
-    nota_lp_keywords = ['nota lp', 'nota_lp', 'portugues', 'português', 'lingua portuguesa', 'lp', 'língua portuguesa']
-    nota_mat_keywords = ['nota mat', 'nota_mat', 'matemática', 'matematica', 'math', 'mat']
-    
-    # Usar função find_similar_columns corretamente
-    colunas_escola_encontradas = find_similar_columns(data, escola_keywords)
-    colunas_total_pontos_encontradas = find_similar_columns(data, total_pontos_keywords)
-    colunas_nota_lp_encontradas = find_similar_columns(data, nota_lp_keywords)
-    colunas_nota_mat_encontradas = find_similar_columns(data, nota_mat_keywords)
+    # Procurar por colunas similares (depende apenas dos nomes das colunas)
+    colunas_encontradas = _identify_columns(tuple(data.columns))
+    colunas_escola_encontradas = colunas_encontradas['escola']
+    colunas_total_pontos_encontradas = colunas_encontradas['total']
+    colunas_nota_lp_encontradas = colunas_encontradas['lp']
+    colunas_nota_mat_encontradas = colunas_encontradas['mat']
     
     # Mostrar colunas encontradas
     st.write("**Colunas identificadas:**")
@@ -866,25 +1201,16 @@ def correlation_analysis(data, dataset_name):
     st.write(f"- Agrupamento: {coluna_escola}")
     st.write(f"- Métricas: {', '.join(colunas_desempenho)}")
     
-    # Criar cópia dos dados
-    data_analysis = data[colunas_analise].copy()
+    # Dados da análise com as métricas já convertidas para numérico (em cache)
+    data_analysis = _coerce_numeric(data[colunas_analise], tuple(colunas_desempenho))
     
     # Mostrar amostra dos dados
     with st.expander("📊 Ver amostra dos dados selecionados"):
-        st.dataframe(data_analysis.head(10))
-    
-    # Converter colunas de desempenho para numérico
-    st.write("**Convertendo colunas para formato numérico...**")
-    for coluna in colunas_desempenho:
-        if data_analysis[coluna].dtype == 'object':
-            data_analysis[coluna] = pd.to_numeric(data_analysis[coluna], errors='coerce')
-            st.write(f"- {coluna}: convertida para numérico")
-        else:
-            st.write(f"- {coluna}: já é numérico")
+        st.dataframe(data.head(10)[colunas_analise])
     
-    # Remover valores nulos
+    # Remover valores nulos apenas nas colunas da análise (escola e métricas)
     initial_count = len(data_analysis)
-    data_clean = data_analysis.dropna()
+    data_clean = data_analysis.dropna(subset=colunas_analise)
     final_count = len(data_clean)
     
     st.write(f"**Limpeza de dados:** {final_count} registros válidos de {initial_count} total")
@@ -896,48 +1222,14 @@ def correlation_analysis(data, dataset_name):
     # Calcular estatísticas por escola
     st.write("**📈 Calculando médias e quantidade de alunos por escola...**")
     
-    # Criar dicionário de agregação
-    agg_dict = {}
-    for coluna in colunas_desempenho:
-        agg_dict[coluna] = 'mean'  # Calcular média para cada coluna de desempenho
-    
-    # Adicionar contagem de alunos (quantidade)
-    agg_dict[colunas_desempenho[0]] = ['count', 'mean']  # Count para quantidade, mean para média
-    
-    # Agrupar por escola
-    medias_por_escola = data_clean.groupby(coluna_escola).agg(agg_dict)
-    
-    # Corrigir nomes das colunas
-    medias_por_escola.columns = ['_'.join(col).strip() for col in medias_por_escola.columns.values]
-    medias_por_escola = medias_por_escola.reset_index()
-    
-    # Renomear colunas para nomes mais claros
-    rename_dict = {coluna_escola: 'Escola'}
-    
-    # Encontrar e renomear a coluna de quantidade (count)
-    for col in medias_por_escola.columns:
-        if '_count' in col:
-            rename_dict[col] = 'Quantidade_Alunos'
-            break
-    
-    # Renomear colunas de média
-    for coluna in colunas_desempenho:
-        for col in medias_por_escola.columns:
-            if f'{coluna}_mean' in col:
-                rename_dict[col] = f'Media_{coluna}'
-    
-    medias_por_escola = medias_por_escola.rename(columns=rename_dict)
-    
-    # Garantir que temos a coluna Quantidade_Alunos
-    if 'Quantidade_Alunos' not in medias_por_escola.columns:
-        contagem_por_escola = data_clean.groupby(coluna_escola).size().reset_index(name='Quantidade_Alunos')
-        medias_por_escola = medias_por_escola.merge(contagem_por_escola, on='Escola')
+    medias_por_escola, corr_matrix = _school_aggregates(data_clean, coluna_escola, tuple(colunas_desempenho))
     
     # Classificar escolas por tamanho
-    medias_por_escola['Tamanho_Escola'] = pd.cut(
-        medias_por_escola['Quantidade_Alunos'],
-        bins=[0, 50, 100, 200, float('inf')],
-        labels=['Pequena (≤50)', 'Média (51-100)', 'Grande (101-200)', 'Muito Grande (>200)']
+    idx_tamanho = np.searchsorted(_TAMANHO_BINS, medias_por_escola['Quantidade_Alunos'].to_numpy(), side='left')
+    medias_por_escola['Tamanho_Escola'] = pd.Categorical(
+        _TAMANHO_LABELS[idx_tamanho],
+        categories=_TAMANHO_LABELS,
+        ordered=True
     )
     
     st.success(f"✅ Calculadas estatísticas para {len(medias_por_escola)} escolas")
@@ -984,12 +1276,11 @@ def correlation_analysis(data, dataset_name):
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.plotly_chart(fig_dist, use_container_width=True)
+        st.plotly_chart(fig_dist, use_container_width=True, config=_PLOTLY_CONFIG)
     
     with col2:
         st.write("**Resumo por Tamanho:**")
-        for tamanho, count in dist_tamanho.items():
-            st.write(f"**{tamanho}:** {count} escolas")
+        st.table(dist_tamanho.rename('Escolas').rename_axis('Tamanho').to_frame())
 
     # ANÁLISE DE CORRELAÇÃO COM DUAS VISUALIZAÇÕES
     st.subheader("📈 Análise de Correlação: Duas Perspectivas")
@@ -1001,219 +1292,89 @@ def correlation_analysis(data, dataset_name):
         st.error("❌ Não há colunas de média calculadas para análise de correlação.")
         return
     
-    # Calcular matriz de correlação
-    colunas_correlacao = ['Quantidade_Alunos'] + colunas_media
-    data_corr = medias_por_escola[colunas_correlacao]
-    corr_matrix = data_corr.corr().round(3)
-    
     # Focar nas correlações com Quantidade_Alunos
     correlacoes_com_quantidade = corr_matrix.loc['Quantidade_Alunos'].drop('Quantidade_Alunos')
     
+    # Nomes, interpretação e força de todas as correlações de uma só vez
+    nomes_metricas = [coluna.replace('Media_', '').replace('_', ' ').title() for coluna in colunas_media]
+    valores_correlacao = correlacoes_com_quantidade[colunas_media].to_numpy()
+    interpretacoes = interpretar_correlacoes(valores_correlacao)
+    forcas = classificar_forcas_correlacao(valores_correlacao)
+    
     # Gráficos de correlação DUPLOS para cada métrica
     st.write("### 📊 Análise Gráfica Dupla por Métrica")
     
-    for coluna_media in colunas_media:
-        nome_metrica = coluna_media.replace('Media_', '').replace('_', ' ').title()
-        correlacao = correlacoes_com_quantidade[coluna_media]
-        
-        st.write(f"#### 📈 {nome_metrica}")
-        
-        # Criar duas colunas para os gráficos
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # GRÁFICO 1: Com diferenciação por tamanho
-            fig_tamanho = px.scatter(
-                medias_por_escola,
-                x='Quantidade_Alunos',
-                y=coluna_media,
-                size='Quantidade_Alunos',
-                color='Tamanho_Escola',
-                size_max=25,
-                title=f'<b>Por Tamanho da Escola</b><br><sub>Correlação: r = {correlacao:.3f}</sub>',
-                trendline="ols",
-                hover_data=['Escola'],
-                hover_name='Escola',
-                labels={
-                    'Quantidade_Alunos': 'Quantidade de Alunos',
-                    coluna_media: f'Média de {nome_metrica}',
-                    'Tamanho_Escola': 'Tamanho da Escola',
-                    'size': 'Quantidade de Alunos'
-                },
-                color_discrete_sequence=px.colors.qualitative.Bold
-            )
-            
-            fig_tamanho.update_layout(
-                height=500,
-                showlegend=True,
-                xaxis_title="Quantidade de Alunos",
-                yaxis_title=f"Média de {nome_metrica}",
-                font=dict(size=11)
+    # Dados para as retas de tendência (mínimos quadrados) de todas as métricas
+    xy = medias_por_escola[['Quantidade_Alunos'] + colunas_media].to_numpy(dtype=float)
+    x_tendencia = np.array([xy[:, 0].min(), xy[:, 0].max()])
+    
+    # Valores arredondados reduzem o JSON enviado ao navegador
+    dados_grafico = medias_por_escola.round(3)
+    
+    # Estatísticas por tamanho de todas as métricas em um único groupby
+    agregacoes_tamanho = {coluna: ['mean', 'std', 'count'] for coluna in colunas_media}
+    agregacoes_tamanho['Quantidade_Alunos'] = ['mean']
+    agg_all = medias_por_escola.groupby('Tamanho_Escola', observed=True).agg(agregacoes_tamanho).round(2)
+    media_alunos_por_tamanho = agg_all[('Quantidade_Alunos', 'mean')].rename('Média Alunos')
+    
+    for i, coluna_media in enumerate(colunas_media):
+        nome_metrica = nomes_metricas[i]
+        correlacao = valores_correlacao[i]
+        
+        # Reta de tendência calculada uma única vez e usada nos dois gráficos
+        tendencia = None
+        if np.ptp(xy[:, 0]) > 0:
+            inclinacao, intercepto = np.polyfit(xy[:, 0], xy[:, i + 1], 1)
+            tendencia = dict(
+                x=x_tendencia,
+                y=np.round(inclinacao * x_tendencia + intercepto, 3),
+                mode='lines',
+                name='Tendência',
+                line=dict(dash='solid', width=3, color='red'),
+                hoverinfo='skip'
             )
-            
-            fig_tamanho.update_traces(
-                marker=dict(opacity=0.7, line=dict(width=1, color='darkgray')),
-                line=dict(dash='solid', width=3, color='red')
-            )
-            
-            st.plotly_chart(fig_tamanho, use_container_width=True)
         
-        with col2:
-            # GRÁFICO 2: Todos os pontos uniformes (análise limpa)
-            fig_uniforme = px.scatter(
-                medias_por_escola,
-                x='Quantidade_Alunos',
-                y=coluna_media,
-                title=f'<b>Visão Geral</b><br><sub>Correlação: r = {correlacao:.3f}</sub>',
-                trendline="ols",
-                hover_data=['Escola', 'Tamanho_Escola'],
-                hover_name='Escola',
-                labels={
-                    'Quantidade_Alunos': 'Quantidade de Alunos',
-                    coluna_media: f'Média de {nome_metrica}'
-                },
-                color_discrete_sequence=['#1f77b4']  # Azul padrão
-            )
-            
-            fig_uniforme.update_layout(
-                height=500,
-                showlegend=False,
-                xaxis_title="Quantidade de Alunos",
-                yaxis_title=f"Média de {nome_metrica}",
-                font=dict(size=11)
-            )
-            
-            fig_uniforme.update_traces(
-                marker=dict(
-                    size=8, 
-                    opacity=0.7, 
-                    line=dict(width=1, color='darkgray')
-                ),
-                line=dict(dash='solid', width=3, color='red')
-            )
-            
-            st.plotly_chart(fig_uniforme, use_container_width=True)
-        
-        # Análise detalhada por tamanho de escola (abaixo dos gráficos)
-        st.write(f"**📋 Análise Detalhada de {nome_metrica} por Tamanho de Escola:**")
-        
-        # Calcular estatísticas por tamanho
-        stats_por_tamanho = medias_por_escola.groupby('Tamanho_Escola').agg({
-            coluna_media: ['mean', 'std', 'count'],
-            'Quantidade_Alunos': 'mean'
-        }).round(2)
-        
-        # Formatando a tabela
+        # Fatia das estatísticas por tamanho desta métrica
+        stats_por_tamanho = agg_all[coluna_media].join(media_alunos_por_tamanho)
         stats_por_tamanho.columns = ['Média', 'Desvio Padrão', 'Nº Escolas', 'Média Alunos']
         stats_por_tamanho = stats_por_tamanho.reset_index()
         
-        # Mostrar tabela e métricas lado a lado
-        col1, col2 = st.columns([3, 1])
-        
-        with col1:
-            st.dataframe(stats_por_tamanho, use_container_width=True)
-        
-        with col2:
-            st.metric(
-                "Correlação Geral",
-                f"{correlacao:.3f}",
-                interpretar_correlacao_simples(correlacao)
-            )
-            
-            # Encontrar melhor desempenho por tamanho
-            if not stats_por_tamanho.empty:
-                melhor_tamanho = stats_por_tamanho.loc[stats_por_tamanho['Média'].idxmax()]
-                st.metric(
-                    "Melhor Desempenho",
-                    f"{melhor_tamanho['Tamanho_Escola']}",
-                    f"Média: {melhor_tamanho['Média']}"
-                )
-        
-        st.write("---")
+        _render_metric(
+            nome_metrica,
+            coluna_media,
+            dados_grafico,
+            stats_por_tamanho,
+            correlacao,
+            interpretacoes[i],
+            tendencia
+        )
     
     # Tabela resumo de correlações
     st.subheader("📋 Resumo Geral das Correlações")
     
-    resumo_correlacoes = []
-    for coluna_media in colunas_media:
-        nome_metrica = coluna_media.replace('Media_', '').replace('_', ' ').title()
-        correlacao = correlacoes_com_quantidade[coluna_media]
-        
-        resumo_correlacoes.append({
-            'Métrica': nome_metrica,
-            'Correlação (r)': correlacao,
-            'Interpretação': interpretar_correlacao_simples(correlacao),
-            'Força': classificar_forca_correlacao(correlacao)
-        })
-    
-    resumo_df = pd.DataFrame(resumo_correlacoes)
+    resumo_df = pd.DataFrame({
+        'Métrica': nomes_metricas,
+        'Correlação (r)': valores_correlacao,
+        'Interpretação': interpretacoes,
+        'Força': forcas
+    })
     st.dataframe(resumo_df, use_container_width=True)
     
-    # Análise comparativa final
-    st.subheader("📈 Visão Comparativa das Correlações")
-    
-    col1, col2 = st.columns(2)
+    # Contagens das correlações (calculadas uma única vez para o resumo e os insights)
+    valores_r = resumo_df['Correlação (r)'].to_numpy()
+    correlacoes_positivas = int((valores_r > 0).sum())
+    correlacoes_negativas = int((valores_r < 0).sum())
+    existe_forte_positiva = bool((valores_r > 0.5).any())
+    existe_forte_negativa = bool((valores_r < -0.5).any())
     
-    with col1:
-        # Gráfico de barras comparativo
-        fig_comparativo = px.bar(
-            resumo_df,
-            x='Métrica',
-            y='Correlação (r)',
-            color='Correlação (r)',
-            color_continuous_scale='RdBu_r',
-            title='Comparação das Correlações',
-            text='Correlação (r)',
-            hover_data=['Interpretação']
-        )
-        
-        fig_comparativo.update_layout(
-            xaxis_title='Métrica de Desempenho',
-            yaxis_title='Coeficiente de Correlação (r)',
-            height=400
-        )
-        
-        fig_comparativo.update_traces(
-            texttemplate='%{text:.3f}', 
-            textposition='outside'
-        )
-        
-        st.plotly_chart(fig_comparativo, use_container_width=True)
-    
-    with col2:
-        # Resumo estatístico
-        st.write("**📊 Resumo Estatístico**")
-        
-        if not resumo_df.empty:
-            # Análise geral
-            correlacoes_positivas = len([r for r in resumo_df['Correlação (r)'] if r > 0])
-            correlacoes_negativas = len([r for r in resumo_df['Correlação (r)'] if r < 0])
-            
-            st.metric("Correlações Positivas", correlacoes_positivas)
-            st.metric("Correlações Negativas", correlacoes_negativas)
-            
-            maior_corr = resumo_df.loc[resumo_df['Correlação (r)'].abs().idxmax()]
-            st.metric(
-                "Maior Correlação (abs)", 
-                f"{maior_corr['Correlação (r)']:.3f}",
-                f"{maior_corr['Métrica']}"
-            )
-            
-            # Distribuição por força
-            st.write("**Força das Correlações:**")
-            for forca in ['Forte', 'Moderada', 'Fraca', 'Muito Fraca']:
-                count = len(resumo_df[resumo_df['Força'] == forca])
-                if count > 0:
-                    st.write(f"- {forca}: {count}")
+    # Análise comparativa final
+    _render_summary(resumo_df, correlacoes_positivas, correlacoes_negativas)
     
     # Insights finais
     st.subheader("💡 Insights e Recomendações")
     
     if not resumo_df.empty:
         # Análise geral
-        correlacoes_positivas = len([r for r in resumo_df['Correlação (r)'] if r > 0])
-        correlacoes_negativas = len([r for r in resumo_df['Correlação (r)'] if r < 0])
-        
         st.write(f"**📈 Distribuição das Correlações:**")
         st.write(f"- **{correlacoes_positivas} correlação(ões) positiva(s)** - Escolas maiores tendem a ter melhor desempenho")
         st.write(f"- **{correlacoes_negativas} correlação(ões) negativa(s)** - Escolas menores tendem a ter melhor desempenho")
@@ -1221,14 +1382,14 @@ def correlation_analysis(data, dataset_name):
         # Recomendações baseadas nos resultados
         st.write("**🎯 Recomendações Estratégicas:**")
         
-        if any(r > 0.5 for r in resumo_df['Correlação (r)']):
+        if existe_forte_positiva:
             st.success("""
             **Forte evidência de vantagem das escolas maiores:**
             - Considere políticas que aproveitem economias de escala
             - Investir em infraestrutura para escolas maiores
             - Desenvolver programas específicos para escolas de grande porte
             """)
-        elif any(r < -0.5 for r in resumo_df['Correlação (r)']):
+        elif existe_forte_negativa:
             st.warning("""
             **Forte evidência de vantagem das escolas menores:**
             - Avaliar estratégias de descentralização
@@ -1249,19 +1410,9 @@ def correlation_analysis(data, dataset_name):
         st.write("**🏫 Destaques por Categoria de Tamanho:**")
         
         # Encontrar a categoria com melhor desempenho médio geral
-        desempenho_por_tamanho = {}
-        for coluna_media in colunas_media:
-            stats = medias_por_escola.groupby('Tamanho_Escola')[coluna_media].mean()
-            for tamanho, media in stats.items():
-                if tamanho not in desempenho_por_tamanho:
-                    desempenho_por_tamanho[tamanho] = []
-                desempenho_por_tamanho[tamanho].append(media)
-        
-        # Calcular média geral por tamanho
-        media_geral_por_tamanho = {
-            tamanho: sum(medias) / len(medias) 
-            for tamanho, medias in desempenho_por_tamanho.items()
-        }
+        # (médias de todas as métricas por tamanho em um único groupby)
+        medias_por_tamanho = medias_por_escola.groupby('Tamanho_Escola', observed=True)[colunas_media].mean()
+        media_geral_por_tamanho = medias_por_tamanho.mean(axis=1).to_dict()
         
         if media_geral_por_tamanho:
             melhor_tamanho_geral = max(media_geral_por_tamanho, key=media_geral_por_tamanho.get)
@@ -1286,34 +1437,35 @@ def interpretar_correlacao_detalhada(r):
     else:
         return "Correlação negativa forte: escolas com menos alunos tendem a ter desempenho significativamente melhor"
 
-def interpretar_correlacao_simples(r):
-    """Interpretação simples do coeficiente de correlação"""
-    if r >= 0.7:
-        return "Correlação positiva forte"
-    elif r >= 0.5:
-        return "Correlação positiva moderada"
-    elif r >= 0.3:
-        return "Correlação positiva fraca"
-    elif r > -0.3:
-        return "Correlação muito fraca ou nula"
-    elif r > -0.5:
-        return "Correlação negativa fraca"
-    elif r > -0.7:
-        return "Correlação negativa moderada"
-    else:
-        return "Correlação negativa forte"
+# Limites para a classificação vetorizada das correlações
+_INTERP_BINS = np.array([-0.7, -0.5, -0.3, 0.3, 0.5, 0.7])
+_INTERP_LABELS = np.array([
+    "Correlação negativa forte",
+    "Correlação negativa moderada",
+    "Correlação negativa fraca",
+    "Correlação muito fraca ou nula",
+    "Correlação positiva fraca",
+    "Correlação positiva moderada",
+    "Correlação positiva forte"
+])
+_FORCA_BINS = np.array([0.3, 0.5, 0.7])
+_FORCA_LABELS = np.array(["Muito Fraca", "Fraca", "Moderada", "Forte"])
 
-def classificar_forca_correlacao(r):
-    """Classifica a força da correlação"""
-    abs_r = abs(r)
-    if abs_r >= 0.7:
-        return "Forte"
-    elif abs_r >= 0.5:
-        return "Moderada"
-    elif abs_r >= 0.3:
-        return "Fraca"
-    else:
-        return "Muito Fraca"
+def interpretar_correlacoes(r):
+    """Interpretação simples de um vetor de coeficientes (limites em _INTERP_BINS)"""
+    r = np.nan_to_num(np.asarray(r, dtype=float))
+    # Os limites pertencem sempre à classe mais forte: à direita para r >= 0, à esquerda para r < 0
+    idx = np.where(
+        r >= 0,
+        np.searchsorted(_INTERP_BINS, r, side='right'),
+        np.searchsorted(_INTERP_BINS, r, side='left')
+    )
+    return _INTERP_LABELS[idx]
+
+def classificar_forcas_correlacao(r):
+    """Classifica a força de um vetor de coeficientes pelo valor absoluto (limites em _FORCA_BINS)"""
+    abs_r = np.abs(np.nan_to_num(np.asarray(r, dtype=float)))
+    return _FORCA_LABELS[np.searchsorted(_FORCA_BINS, abs_r, side='right')]
 
 
 
@@ -1325,8 +1477,8 @@ analysis_type = st.sidebar.radio(
 )
 
 # Carregar dados
-dados_3anos = load_data("dados_3anos.csv")
-dados_9anos = load_data("dados_9anos.csv")
+dados_3anos = load_data("dados_3anos.csv", file_mtime("dados_3anos.csv"))
+dados_9anos = load_data("dados_9anos.csv", file_mtime("dados_9anos.csv"))
 
 # Verificar se os dados foram carregados
 if dados_3anos is not None and dados_9anos is not None: